@@ -1,29 +1,107 @@
-import sys
 import os 
 import uno
 import json
 import unohelper
-import officehelper # type: ignore
-import urllib.request
-import urllib.parse
-import platform
+import http.client
+import threading
+import re
+import hashlib
+import collections
+import socket
 
 from com.sun.star.task import XJobExecutor # type: ignore
-from com.sun.star.awt import XActionListener # type: ignore
+from com.sun.star.awt import XActionListener, XCallback # type: ignore
 from com.sun.star.frame import XDispatchProvider, XDispatch # type: ignore
 from com.sun.star.beans import PropertyValue # type: ignore
+from com.sun.star.lang import DisposedException # type: ignore
 from com.sun.star.awt import MessageBoxButtons as MSG_BUTTONS # type: ignore
 from com.sun.star.awt import MessageBoxResults as MSG_RESULTS # type: ignore
+from com.sun.star.awt.PosSize import POS, SIZE, POSSIZE # type: ignore
+from com.sun.star.awt.PushButtonType import OK # type: ignore
+from com.sun.star.util.MeasureUnit import TWIP # type: ignore
 try:
     from com.sun.star.util import PathSubstitution  # type: ignore
     HAS_PATH_SUBSTITUTION = True
 except ImportError:
     HAS_PATH_SUBSTITUTION = False
+try:
+    # orjson o ujson son opcionales y mucho más rápidos que json para analizar y serializar
+    import orjson  # type: ignore
+    _json_loads = orjson.loads
+    _json_dumps = orjson.dumps
+except ImportError:
+    try:
+        import ujson  # type: ignore
+        _json_loads = ujson.loads
+        def _json_dumps(obj):
+            return ujson.dumps(obj, ensure_ascii=False).encode("utf-8")
+    except ImportError:
+        _json_loads = json.loads
+        def _json_dumps(obj):
+            return json.dumps(obj).encode("utf-8")
+try:
+    # httpx con soporte HTTP/2 (requiere el paquete h2) es opcional
+    import httpx  # type: ignore
+    import h2  # type: ignore
+    HAS_HTTPX = True
+except ImportError:
+    HAS_HTTPX = False
+
+API_HOST = "api.openai.com"
+API_PATH = "/v1/chat/completions"
+API_TIMEOUT = 60
+API_PREWARM_PATH = "/v1/models"
+BATCH_DELAY = 0.25
+BATCH_SIZE = 8
+RESPONSE_CACHE_SIZE = 32
+
+# Directorio de los archivos de idioma distribuidos junto a este módulo, si se puede determinar
+try:
+    _LANG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "lang") + os.sep
+    if not os.path.isdir(_LANG_DIR):
+        _LANG_DIR = None
+except NameError:
+    _LANG_DIR = None
 
-API_URL = "https://api.openai.com/v1/chat/completions"
 SEETINGS_FILE = "aiwriter.json"
 DEFAULT_LANG = "es"
 EXTENSION_NAME = "AIWriterExtension.oxt"
+AI_COMMANDS = ("translate", "complete", "summarize", "improve", "expand")
+
+
+def _load_lang(filename):
+    """
+    Lee y analiza un archivo de idioma.
+
+    :param filename: La ruta del archivo de idioma.
+    :return: Un diccionario con las cadenas de idioma.
+    """
+    # Leer en binario: el analizador JSON decodifica el UTF-8 por sí mismo
+    with open(filename, "rb") as lang_file:
+        return _json_loads(lang_file.read())
+
+
+class MainThreadCallback(unohelper.Base, XCallback):
+    """
+    Adaptador de XCallback que ejecuta una función de Python en el hilo principal.
+
+    Se registra en el servicio com.sun.star.awt.AsyncCallback para que las
+    modificaciones del documento y los diálogos se realicen desde el hilo de la
+    interfaz de LibreOffice, aunque el trabajo se haya hecho en un hilo secundario.
+
+    Si el documento se ha cerrado mientras la petición seguía en curso, el cursor y
+    la barra de estado ya no existen y el resultado se descarta.
+    """
+
+    def __init__(self, func, *args):
+        self.func = func
+        self.args = args
+
+    def notify(self, data):
+        try:
+            self.func(*self.args)
+        except DisposedException:
+            pass
 
 class AIWriterExtension(unohelper.Base, XJobExecutor):
     """
@@ -43,6 +121,26 @@ class AIWriterExtension(unohelper.Base, XJobExecutor):
     - Mostrar diálogos de configuración y notificación al usuario.
     """
 
+    # Cliente HTTP persistente con la API, compartido entre instancias
+    _http = None
+    _http_lock = threading.RLock()
+    _prewarmed = False
+
+    # Comandos pendientes de enviar agrupados, indexados por (comando, idioma)
+    _pending = {}
+    _batch_timers = {}
+    _batch_lock = threading.Lock()
+
+    # Valores que no cambian durante la sesión de LibreOffice
+    _lang_cache = {}
+    _extension_path = None
+    _ui_language = None
+    _toolkit = None
+
+    # Últimas respuestas de la API, indexadas por el hash de la petición enviada
+    _response_cache = collections.OrderedDict()
+    _response_cache_lock = threading.Lock()
+
     def __init__(self, ctx):
         """
         Inicializa la instancia de AIWriterExtension.
@@ -53,9 +151,25 @@ class AIWriterExtension(unohelper.Base, XJobExecutor):
 
         :param ctx: El contexto del componente UNO, que proporciona acceso a los servicios de LibreOffice.
         """
-        self.lang = json.loads(self.get_language())
+        self.lang = lang = self.get_language()
+
+        # Plantillas de prompt por comando, construidas una sola vez
+        self._prompt_templates = {
+            "complete": lang['prompt_complete'] + ": ",
+            "summarize": lang['prompt_summarize'] + ": ",
+            "improve": lang['prompt_improve'] + ": ",
+            "expand": lang['prompt_expand'] + ": ",
+            "translate": lang['prompt_translate'] + " ",
+        }
+
+        # Etiquetas de los bloques insertados, calculadas una sola vez
+        self._cmd_labels = {command: lang['command_' + command].upper() for command in AI_COMMANDS}
+        self._block_marks = (lang['block_start'], lang['block_end'])
         
         self.ctx = ctx
+        self._config_cache = None
+        self._config_path = None
+        self._async_callback = None
         try:
             self.sm = ctx.getServiceManager()
             self.desktop = XSCRIPTCONTEXT.getDesktop() # type: ignore
@@ -63,6 +177,11 @@ class AIWriterExtension(unohelper.Base, XJobExecutor):
             self.sm = ctx.ServiceManager
             self.desktop = self.ctx.getServiceManager().createInstanceWithContext("com.sun.star.frame.Desktop", self.ctx)
 
+        # Abrir la conexión con la API en segundo plano para que el primer comando no pague el handshake
+        if not AIWriterExtension._prewarmed and self.get_config("openai_api_key", "") != "":
+            AIWriterExtension._prewarmed = True
+            threading.Thread(target=self.prewarm_connection, daemon=True).start()
+
     def trigger(self, command):
         """
         Ejecuta un comando específico dentro de LibreOffice Writer.
@@ -76,156 +195,301 @@ class AIWriterExtension(unohelper.Base, XJobExecutor):
         :raises Exception: Si ocurre un error durante la ejecución de un comando, se muestra un mensaje de error.
         """
 
-        desktop = self.ctx.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", self.ctx)
-        model = desktop.getCurrentComponent()
+        lang = self.lang
+        model = self.desktop.getCurrentComponent()
         if not hasattr(model, "Text"):
             model = self.desktop.loadComponentFromURL("private:factory/swriter", "_blank", 0, ())
-        selection = model.CurrentController.getSelection()
 
         if command == "hello":
             return
         
         elif command == "settings":
             try:
-                result = self.settings_box(self.lang['settings'])
-                if not result:
-                    return
-                else:
-                    openai_api_key = result['openai_api_key']
-                    self.set_config("openai_api_key", openai_api_key)
-                    openai_model = result["model"]
-                    self.set_config("model", openai_model)
-                    max_tokens = result["max_tokens"]
-                    self.set_config("max_tokens", max_tokens)
-                    temperature = result["temperature"]
-                    self.set_config("temperature", temperature)
-                return
+                result = self.settings_box(lang['settings'])
+                if result:
+                    self.set_config_many({
+                        "openai_api_key": result['openai_api_key'],
+                        "model": result["model"],
+                        "max_tokens": result["max_tokens"],
+                        "temperature": result["temperature"]
+                    })
             except Exception as e:
-                text_range = selection.getByIndex(0)
-                text_range.setString(text_range.getString() + ":error: " + str(e))
+                self.show_dialog(lang['error'], str(e))
         
         elif command == "translate":
-            doc = self.get_document()
-            if not doc:
-                return
-            
-            selection = doc.getCurrentController().getViewCursor().getString()            
-            if not selection.strip():
-                self.show_dialog(self.lang["error"], self.lang["no_text_selected"])
-                return
-            
-            openai_api_key = self.get_config("openai_api_key", "")
-            if openai_api_key == "":
-                self.show_dialog(self.lang["error"], self.lang["no_api_key"])
+            required = self._require_selection_and_key()
+            if not required:
                 return
+            doc, selection = required
             
             try:
-                result = self.translation_box(self.lang['translate'])
-                if not result:
-                    return
-                else:
+                result = self.translation_box(lang['translate'])
+                if result:
                     language = result['language']
                     self.set_config("language", language)
-                    if language != "":                        
-                        ai_result = self.process_text(selection, command, language)
-                        if ai_result:
-                            self.insert_text(doc, ai_result, selection, command)
-
+                    if language != "":
+                        self.start_ai(doc, selection, command, language)
             except Exception as e:
-                text_range = selection.getByIndex(0)
-                text_range.setString(text_range.getString() + ":error: " + str(e))
+                self.show_dialog(lang['error'], str(e))
         
         else:
-            doc = self.get_document()
-            if not doc:
-                return
-            
-            selection = doc.getCurrentController().getViewCursor().getString()            
-            if not selection.strip():
-                self.show_dialog(self.lang["error"], self.lang["no_text_selected"])
+            required = self._require_selection_and_key()
+            if not required:
                 return
+            doc, selection = required
 
-            openai_api_key = self.get_config("openai_api_key", "")
-            if openai_api_key == "":
-                self.show_dialog(self.lang["error"], self.lang["no_api_key"])
-                return
-        
-            ai_result = self.process_text(selection, command)
-            if ai_result:
-                self.insert_text(doc, ai_result, selection, command)
-        
+            try:
+                self.start_ai(doc, selection, command)
+            except Exception as e:
+                self.show_dialog(lang['error'], str(e))
+
+    def _require_selection_and_key(self):
+        """
+        Comprueba que hay texto seleccionado y una clave de API configurada.
+
+        Si falta alguno de los dos, se muestra el mensaje de error correspondiente.
+
+        :return: Una tupla (documento, texto seleccionado), o None si no se puede continuar.
+        """
+        lang = self.lang
+        doc = self.get_document()
+        if not doc:
+            return None
+
+        selection = doc.getCurrentController().getViewCursor().getString()
+        if not selection.strip():
+            self.show_dialog(lang["error"], lang["no_text_selected"])
+            return None
+
+        if self.get_config("openai_api_key", "") == "":
+            self.show_dialog(lang["error"], lang["no_api_key"])
+            return None
+
+        return doc, selection
+
+    def start_ai(self, doc, selection, command, language=""):
+        """
+        Lanza el procesamiento de la IA en un hilo secundario.
+
+        Captura el rango seleccionado y muestra un mensaje en la barra de estado
+        antes de devolver el control a LibreOffice, de modo que la interfaz sigue
+        respondiendo mientras se espera la respuesta de la API.
+
+        :param doc: El documento activo.
+        :param selection: El texto seleccionado a procesar.
+        :param command: El comando de IA a ejecutar.
+        :param language: El idioma de destino para la traducción (opcional).
+        """
+        view_cursor = doc.getCurrentController().getViewCursor()
+        target = view_cursor.getText().createTextCursorByRange(view_cursor)
+
+        status = doc.getCurrentController().getFrame().createStatusIndicator()
+        status.start(self.lang["processing"], 0)
+
+        if self.get_config("batching", False):
+            self.queue_ai(target, status, selection, command, language)
+        else:
+            threading.Thread(target=self._run_ai, args=(target, status, selection, command, language), daemon=True).start()
+
+    def queue_ai(self, target, status, selection, command, language):
+        """
+        Añade un comando a la cola de envío agrupado.
+
+        Los comandos con el mismo comando e idioma que llegan en un intervalo de
+        BATCH_DELAY segundos se envían juntos en una única petición a la API.
+        Si la cola alcanza BATCH_SIZE elementos se envía inmediatamente.
+
+        :param target: El cursor de texto que abarca la selección original.
+        :param status: El indicador de la barra de estado asociado al comando.
+        :param selection: El texto seleccionado a procesar.
+        :param command: El comando de IA a ejecutar.
+        :param language: El idioma de destino para la traducción.
+        """
+        key = (command, language)
+        with AIWriterExtension._batch_lock:
+            jobs = AIWriterExtension._pending.setdefault(key, [])
+            jobs.append((target, status, selection))
+            full = len(jobs) >= BATCH_SIZE
+            if not full and key not in AIWriterExtension._batch_timers:
+                timer = threading.Timer(BATCH_DELAY, self._flush_batch, args=(key,))
+                timer.daemon = True
+                AIWriterExtension._batch_timers[key] = timer
+                timer.start()
+
+        if full:
+            threading.Thread(target=self._flush_batch, args=(key,), daemon=True).start()
+
+    def _flush_batch(self, key):
+        """
+        Envía a la API los comandos pendientes de un grupo desde el hilo secundario.
+
+        Si la respuesta agrupada no puede dividirse en tantas partes como
+        comandos, cada texto se procesa por separado.
+        """
+        with AIWriterExtension._batch_lock:
+            jobs = AIWriterExtension._pending.pop(key, [])
+            timer = AIWriterExtension._batch_timers.pop(key, None)
+        if timer:
+            timer.cancel()
+        if not jobs:
+            return
+
+        command, language = key
+        selections = [selection for _, _, selection in jobs]
+        results = [None] * len(jobs)
+        try:
+            batch_results = self.process_batch(selections, command, language) if len(jobs) > 1 else None
+            if batch_results is None:
+                batch_results = [self.process_text(selection, command, language) for selection in selections]
+            results = batch_results
+        except Exception as e:
+            self.run_in_main_thread(self.show_dialog, self.lang["error"], str(e))
+        finally:
+            for (target, status, _), ai_result in zip(jobs, results):
+                self.run_in_main_thread(self._finish_ai, target, status, ai_result, command, language)
+
+    def _run_ai(self, target, status, selection, command, language):
+        """
+        Ejecuta la llamada a la API desde el hilo secundario.
+
+        La respuesta se recibe en streaming y cada fragmento se devuelve al hilo
+        principal mediante AsyncCallback, que es quien modifica el documento y
+        limpia la barra de estado.
+        """
+        started = []
+
+        def on_chunk(chunk):
+            if not started:
+                started.append(True)
+                self.run_in_main_thread(self.begin_insert, target, command, language)
+            self.run_in_main_thread(self.append_text, target, chunk)
+
+        try:
+            self.process_text(selection, command, language, on_chunk)
+        except Exception as e:
+            self.run_in_main_thread(self.show_dialog, self.lang["error"], str(e))
+        finally:
+            self.run_in_main_thread(self._finish_stream, target, status, command, language, bool(started))
+
+    def _finish_stream(self, target, status, command, language, started):
+        """Cierra el bloque de la respuesta y limpia la barra de estado desde el hilo principal."""
+        status.end()
+        if started:
+            self.end_insert(target, command, language)
+
+    def _finish_ai(self, target, status, ai_result, command, language):
+        """Inserta el resultado de la IA y limpia la barra de estado desde el hilo principal."""
+        status.end()
+        if ai_result:
+            self.insert_text(target, ai_result, command, language)
+
+    def run_in_main_thread(self, func, *args):
+        """
+        Programa la ejecución de una función en el hilo principal de LibreOffice.
+
+        :param func: La función a ejecutar.
+        :param args: Los argumentos que se pasarán a la función.
+        """
+        if self._async_callback is None:
+            self._async_callback = self.sm.createInstanceWithContext("com.sun.star.awt.AsyncCallback", self.ctx)
+        self._async_callback.addCallback(MainThreadCallback(func, *args), None)
+
+    def _get_config_path(self):
+        """
+        Obtiene la ruta completa del archivo de configuración.
+
+        La ruta se resuelve una única vez a través del servicio PathSettings y se
+        guarda en la instancia para evitar repetir la llamada UNO.
+
+        :return: La ruta del archivo de configuración en el sistema.
+        """
+        if self._config_path is None:
+            path_settings = self.sm.createInstanceWithContext('com.sun.star.util.PathSettings', self.ctx)
+            user_config_path = getattr(path_settings, "UserConfig")
+            if user_config_path.startswith('file://'):
+                user_config_path = str(uno.fileUrlToSystemPath(user_config_path))
+
+            # Asegurar que la ruta termine con el nombre del archivo
+            self._config_path = os.path.join(user_config_path, SEETINGS_FILE)
+        return self._config_path
+
+    def _load_config(self):
+        """
+        Carga el archivo de configuración en memoria.
+
+        El archivo solo se lee la primera vez; las llamadas posteriores devuelven
+        el diccionario guardado en caché.
+
+        :return: Un diccionario con la configuración actual.
+        """
+        if self._config_cache is None:
+            config_file_path = self._get_config_path()
+            config_data = {}
+
+            # Intentar cargar el contenido JSON del archivo si existe
+            if os.path.exists(config_file_path):
+                try:
+                    with open(config_file_path, 'r') as file:
+                        config_data = json.load(file)
+                except (IOError, json.JSONDecodeError):
+                    config_data = {}
+
+            self._config_cache = config_data
+        return self._config_cache
 
     def get_config(self,key,default):
         """
         Obtiene un valor de configuración del archivo de ajustes.
 
-        Lee el archivo JSON de configuración y devuelve el valor asociado a una clave.
+        Consulta la configuración cargada en memoria y devuelve el valor asociado a una clave.
         Si el archivo o la clave no existen, devuelve un valor por defecto.
 
         :param key: La clave de configuración a buscar.
         :param default: El valor a devolver si la clave no se encuentra.
         :return: El valor de la configuración o el valor por defecto.
         """
-        path_settings = self.sm.createInstanceWithContext('com.sun.star.util.PathSettings', self.ctx)
-        user_config_path = getattr(path_settings, "UserConfig")
-        if user_config_path.startswith('file://'):
-            user_config_path = str(uno.fileUrlToSystemPath(user_config_path))
-
-        # Asegurar que la ruta termine con el nombre del archivo
-        config_file_path = os.path.join(user_config_path, SEETINGS_FILE)
-
-        # Comprobar si el archivo existe
-        if not os.path.exists(config_file_path):
-            return default
-
-        # Intentar cargar el contenido JSON del archivo
-        try:
-            with open(config_file_path, 'r') as file:
-                config_data = json.load(file)
-        except (IOError, json.JSONDecodeError):
-            return default
-
         # Devolver el valor correspondiente a la clave, o el valor por defecto si la clave no se encuentra
-        return config_data.get(key, default)
+        return self._load_config().get(key, default)
 
     def set_config(self, key, value):
         """
         Establece un valor de configuración en el archivo de ajustes.
 
-        Escribe un par clave-valor en el archivo de configuración JSON.
-        Si el archivo no existe, lo crea.
+        Actualiza la configuración en memoria y escribe el par clave-valor en el
+        archivo de configuración JSON. Si el archivo no existe, lo crea.
 
         :param key: La clave de configuración a establecer.
         :param value: El valor a guardar.
         """
-        path_settings = self.sm.createInstanceWithContext('com.sun.star.util.PathSettings', self.ctx)
-        user_config_path = getattr(path_settings, "UserConfig")
+        self.set_config_many({key: value})
 
-        if user_config_path.startswith('file://'):
-            user_config_path = str(uno.fileUrlToSystemPath(user_config_path))
+    def set_config_many(self, values):
+        """
+        Establece varios valores de configuración con una única escritura del archivo.
 
-        # Asegurar que la ruta termine con el nombre del archivo
-        config_file_path = os.path.join(user_config_path, SEETINGS_FILE)
+        Si ningún valor cambia respecto a la configuración actual, el archivo no se
+        reescribe. La escritura se hace en un archivo temporal que después reemplaza
+        al original, de forma que un fallo a mitad de escritura no lo deja truncado.
 
-        # Cargar la configuración existente si el archivo existe
-        if os.path.exists(config_file_path):
-            try:
-                with open(config_file_path, 'r') as file:
-                    config_data = json.load(file)
-            except (IOError, json.JSONDecodeError):
-                config_data = {}
-        else:
-            config_data = {}
+        :param values: Un diccionario con los pares clave-valor a guardar.
+        """
+        config_data = self._load_config()
+        if all(key in config_data and config_data[key] == value for key, value in values.items()):
+            return
 
-        # Actualizar la configuración con el nuevo par clave-valor
-        config_data[key] = value
+        # Actualizar la configuración con los nuevos pares clave-valor
+        config_data.update(values)
 
         # Escribir la configuración actualizada de nuevo en el archivo
+        config_file_path = self._get_config_path()
+        tmp_file_path = config_file_path + ".tmp"
         try:
-            with open(config_file_path, 'w') as file:
+            with open(tmp_file_path, 'w') as file:
                 json.dump(config_data, file, indent=4)
+            os.replace(tmp_file_path, config_file_path)
         except IOError as e:
-            # Manejar posibles errores de E/S (opcional)
+            # Invalidar la caché para que la próxima lectura refleje el contenido real del archivo
+            self._config_cache = None
             print(f"Error writing to {config_file_path}: {e}")
 
     def get_document(self):
@@ -234,12 +498,25 @@ class AIWriterExtension(unohelper.Base, XJobExecutor):
 
         :return: El objeto del componente del documento activo.
         """
-        desktop = self.ctx.ServiceManager.createInstanceWithContext(
-            "com.sun.star.frame.Desktop", self.ctx
-        )
-        return desktop.getCurrentComponent()
+        return self.desktop.getCurrentComponent()
     
-    def process_text(self, text, command, lang=""):
+    def build_prompt(self, text, command, lang=""):
+        """
+        Construye el prompt para la API según el comando.
+
+        :param text: El texto a procesar.
+        :param command: El comando de IA a ejecutar (ej. 'complete', 'summarize').
+        :param lang: El idioma de destino para la traducción (opcional).
+        :return: El prompt, o None si el comando no es válido.
+        """
+        template = self._prompt_templates.get(command)
+        if template is None:
+            return None
+        if command == "translate":
+            return template + lang + ": " + text
+        return template + text
+
+    def process_text(self, text, command, lang="", on_chunk=None):
         """
         Procesa el texto seleccionado enviándolo a la API de OpenAI.
 
@@ -248,33 +525,129 @@ class AIWriterExtension(unohelper.Base, XJobExecutor):
         :param text: El texto a procesar.
         :param command: El comando de IA a ejecutar (ej. 'complete', 'summarize').
         :param lang: El idioma de destino para la traducción (opcional).
+        :param on_chunk: Función opcional que recibe cada fragmento de la respuesta en streaming.
         :return: El texto procesado por la IA, o None si el comando no es válido.
         """
-        prompt_map = {
-            "complete": f"{self.lang['prompt_complete']}: {text}",
-            "summarize": f"{self.lang['prompt_summarize']}: {text}",
-            "improve": f"{self.lang['prompt_improve']}: {text}",
-            "expand": f"{self.lang['prompt_expand']}: {text}",
-            "translate": f"{self.lang['prompt_translate']} {lang}: {text}",
-        }        
-        if command not in prompt_map:
+        prompt = self.build_prompt(text, command, lang)
+        if prompt is None:
             return None
-        
-        openai_api_key = self.get_config("openai_api_key", "")
-        headers = {
-            "Authorization": f"Bearer {openai_api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        payload = {
+
+        # Si ya se envió exactamente la misma petición, reutilizar la respuesta
+        data = _json_dumps(self.build_payload(prompt))
+        key = self.response_cache_key(data)
+        result = self.get_cached_response(key)
+        if result is not None:
+            if on_chunk is not None:
+                on_chunk(result)
+            return result
+
+        result = self.request_completion(data, on_chunk)
+        self.store_response(key, result)
+        return result
+
+    def process_batch(self, texts, command, lang=""):
+        """
+        Procesa varios textos con el mismo comando en una única petición a la API.
+
+        Cada texto se envía como una tarea numerada y la respuesta se divide
+        por los mismos marcadores. Los textos cuya respuesta ya está en caché no se
+        vuelven a enviar, y cada respuesta nueva se guarda con la misma clave que
+        usaría process_text para ese texto.
+
+        :param texts: La lista de textos a procesar.
+        :param command: El comando de IA a ejecutar (ej. 'complete', 'summarize').
+        :param lang: El idioma de destino para la traducción (opcional).
+        :return: Una lista con el resultado de cada texto, o None si el comando no
+                 es válido o la respuesta no contiene una parte por cada texto.
+        """
+        prompts = [self.build_prompt(text, command, lang) for text in texts]
+        if None in prompts:
+            return None
+
+        datas = [_json_dumps(self.build_payload(prompt)) for prompt in prompts]
+        keys = [self.response_cache_key(data) for data in datas]
+        results = [self.get_cached_response(key) for key in keys]
+        missing = [index for index, result in enumerate(results) if result is None]
+        if not missing:
+            return results
+        if len(missing) == 1:
+            index = missing[0]
+            results[index] = self.request_completion(datas[index])
+            self.store_response(keys[index], results[index])
+            return results
+
+        tasks = "\n\n".join(f"[TASK {number}] {prompts[index]}" for number, index in enumerate(missing, 1))
+        prompt = f"{self.lang['prompt_batch']}\n\n{tasks}"
+        content = self.request_completion(_json_dumps(self.build_payload(prompt)))
+        if content is None:
+            # El error ya se ha notificado al usuario: no reintentar por separado
+            return results
+
+        parts = re.split(r"\[TASK (\d+)\]", content)
+        answers = {int(number): answer.strip() for number, answer in zip(parts[1::2], parts[2::2])}
+        if sorted(answers) != list(range(1, len(missing) + 1)):
+            return None
+        for number, index in enumerate(missing, 1):
+            results[index] = answers[number]
+            self.store_response(keys[index], results[index])
+        return results
+
+    def response_cache_key(self, data):
+        """
+        Calcula la clave de caché de una petición ya serializada.
+
+        La clave es el hash de la petición completa (modelo, mensajes, máximo de tokens
+        y temperatura), de modo que cualquier cambio en los ajustes genera una clave distinta.
+
+        :param data: El cuerpo JSON de la petición, codificado en UTF-8.
+        :return: La clave de caché.
+        """
+        return hashlib.blake2b(data, digest_size=16).digest()
+
+    def get_cached_response(self, key):
+        """
+        Obtiene una respuesta guardada en caché y la marca como usada recientemente.
+
+        :param key: La clave de caché de la petición.
+        :return: La respuesta guardada, o None si no está en caché.
+        """
+        with AIWriterExtension._response_cache_lock:
+            result = AIWriterExtension._response_cache.get(key)
+            if result is not None:
+                AIWriterExtension._response_cache.move_to_end(key)
+        return result
+
+    def store_response(self, key, result):
+        """
+        Guarda una respuesta en caché, descartando la más antigua si se supera el tamaño máximo.
+
+        :param key: La clave de caché de la petición.
+        :param result: La respuesta de la API. Las respuestas vacías no se guardan.
+        """
+        if not result:
+            return
+        with AIWriterExtension._response_cache_lock:
+            AIWriterExtension._response_cache[key] = result
+            if len(AIWriterExtension._response_cache) > RESPONSE_CACHE_SIZE:
+                AIWriterExtension._response_cache.popitem(last=False)
+
+    def build_payload(self, prompt):
+        """
+        Construye el cuerpo de la petición a la API para un prompt.
+
+        :param prompt: El mensaje del usuario.
+        :return: Un diccionario con el modelo, los mensajes y los parámetros de generación.
+        """
+        return {
             "model": self.get_config("model", "gpt-4o-mini"),
             "messages": [
                 {
-                    "role":"assistant", 
+                    # Prefijo fijo en la primera posición para aprovechar la caché de prompts de OpenAI
+                    "role":"system", 
                     "content": [
                         { 
                             "type": "text",
-                            "text": f"{self.lang['prompt_assistant']}"
+                            "text": self.lang['prompt_assistant']
                         }
                     ]
                 },{
@@ -282,7 +655,7 @@ class AIWriterExtension(unohelper.Base, XJobExecutor):
                     "content": [
                         {
                             "type": "text",
-                            "text": prompt_map[command]
+                            "text": prompt
                         }
                     ]
                 }
@@ -290,39 +663,243 @@ class AIWriterExtension(unohelper.Base, XJobExecutor):
             "max_completion_tokens": int(self.get_config("max_tokens", "1000")),
             "temperature": float(self.get_config("temperature", "0.5"))
         }
+
+    def request_completion(self, data, on_chunk=None):
+        """
+        Envía una petición a la API de OpenAI y devuelve la respuesta.
+
+        Si se indica on_chunk, la respuesta se solicita en streaming (eventos SSE)
+        y cada fragmento de texto se pasa a on_chunk en cuanto llega.
+
+        :param data: El cuerpo JSON de la petición (ver build_payload), codificado en UTF-8.
+        :param on_chunk: Función opcional que recibe cada fragmento de la respuesta.
+        :return: El texto generado por la IA, o None si se produce un error.
+        """
+        openai_api_key = self.get_config("openai_api_key", "")
+        headers = {
+            "Authorization": f"Bearer {openai_api_key}",
+            "Content-Type": "application/json"
+        }
+        
+        if on_chunk is not None:
+            # Añadir "stream" sin volver a serializar: el objeto JSON termina en "}"
+            data = data[:-1] + b',"stream":true}'
+        parts = []
+        # Espacios finales aún no emitidos: solo se envían si después llega más texto
+        trailing = [""]
+
+        def on_line(line):
+            # Cada evento SSE tiene la forma "data: {...}" y termina con "data: [DONE]"
+            line = line.strip()
+            if not line.startswith("data:"):
+                return
+            event = line[5:].strip()
+            if event == "[DONE]":
+                return
+            choices = _json_loads(event).get("choices")
+            if not choices:
+                return
+            chunk = choices[0].get("delta", {}).get("content")
+            if chunk and not parts:
+                chunk = chunk.lstrip()
+            if not chunk:
+                return
+            content = chunk.rstrip()
+            if not content:
+                trailing[0] += chunk
+                return
+            text = trailing[0] + content
+            trailing[0] = chunk[len(content):]
+            parts.append(text)
+            on_chunk(text)
+
         try:
-            data = json.dumps(payload).encode("utf-8")  # Convertir payload a JSON y codificarlo
-            req = urllib.request.Request(API_URL, data=data, headers=headers, method="POST")
-            
-            with urllib.request.urlopen(req) as response:
-                if response.status == 200:
-                    response_data = json.loads(response.read().decode("utf-8"))
-                    return response_data["choices"][0]["message"]["content"].strip()
-                else:
-                    self.show_dialog(self.lang["error"], f"{response.read().decode('utf-8')}")
+            status, body = self.post_request(API_PATH, data, headers, on_line if on_chunk is not None else None)
+
+            if status == 200 and on_chunk is not None:
+                return "".join(parts).strip()
+            elif status == 200:
+                response_data = _json_loads(body)
+                return response_data["choices"][0]["message"]["content"].strip()
+            else:
+                self.run_in_main_thread(self.show_dialog, self.lang["error"], f"{body.decode('utf-8')}")
         except Exception as e:
-            self.show_dialog(self.lang["error"], str(e))
+            self.run_in_main_thread(self.show_dialog, self.lang["error"], str(e))
+
+    def get_http_connection(self):
+        """
+        Obtiene el cliente HTTP persistente con la API de OpenAI.
+
+        Si httpx y h2 están instalados se usa un httpx.Client con HTTP/2, que permite
+        multiplexar varias peticiones simultáneas sobre la misma conexión. En caso
+        contrario se recurre a una http.client.HTTPSConnection con keep-alive.
+        El cliente se crea la primera vez que se necesita y se reutiliza en las
+        siguientes peticiones, evitando repetir el handshake TCP y TLS.
+
+        :return: El cliente httpx.Client o la conexión http.client.HTTPSConnection compartida.
+        """
+        with AIWriterExtension._http_lock:
+            if AIWriterExtension._http is None:
+                if HAS_HTTPX:
+                    AIWriterExtension._http = httpx.Client(
+                        http2=True,
+                        base_url=f"https://{API_HOST}",
+                        timeout=float(API_TIMEOUT),
+                        limits=httpx.Limits(max_connections=4, max_keepalive_connections=4)
+                    )
+                else:
+                    AIWriterExtension._http = http.client.HTTPSConnection(API_HOST, timeout=API_TIMEOUT)
+            return AIWriterExtension._http
+
+    def close_http_connection(self):
+        """Cierra y descarta el cliente HTTP persistente."""
+        with AIWriterExtension._http_lock:
+            if AIWriterExtension._http is not None:
+                AIWriterExtension._http.close()
+                AIWriterExtension._http = None
+
+    def prewarm_connection(self):
+        """
+        Resuelve el DNS y abre la conexión TLS con la API antes del primer comando.
+
+        Envía una petición HEAD cuya respuesta se descarta. Cualquier error se ignora,
+        ya que la primera petición real volverá a abrir la conexión si es necesario.
+        """
+        try:
+            socket.getaddrinfo(API_HOST, 443)
+            if HAS_HTTPX:
+                self.get_http_connection().head(API_PREWARM_PATH)
+                return
 
-    def insert_text(self, doc, new_text, selection, command):
+            with AIWriterExtension._http_lock:
+                connection = self.get_http_connection()
+                try:
+                    connection.request("HEAD", API_PREWARM_PATH)
+                    connection.getresponse().read()
+                except Exception:
+                    self.close_http_connection()
+        except Exception:
+            pass
+
+    def post_request(self, path, data, headers, on_line=None):
+        """
+        Envía una petición POST a la API reutilizando el cliente persistente.
+
+        Con http.client, si el servidor ha cerrado la conexión inactiva, se vuelve
+        a abrir y se reintenta la petición una sola vez. httpx gestiona por sí mismo
+        su conjunto de conexiones y es seguro entre hilos.
+
+        :param path: La ruta del endpoint de la API.
+        :param data: El cuerpo de la petición ya codificado.
+        :param headers: Las cabeceras HTTP de la petición.
+        :param on_line: Función opcional que recibe cada línea de una respuesta correcta
+                        a medida que llega. En ese caso el cuerpo devuelto está vacío.
+        :return: Una tupla con el código de estado y el cuerpo de la respuesta en bytes.
+        """
+        if HAS_HTTPX:
+            client = self.get_http_connection()
+            if on_line is None:
+                response = client.post(path, content=data, headers=headers)
+                return response.status_code, response.content
+
+            with client.stream("POST", path, content=data, headers=headers) as response:
+                if response.status_code != 200:
+                    return response.status_code, response.read()
+                for line in response.iter_lines():
+                    on_line(line)
+                return response.status_code, b""
+
+        with AIWriterExtension._http_lock:
+            for attempt in range(2):
+                connection = self.get_http_connection()
+                try:
+                    connection.request("POST", path, body=data, headers=headers)
+                    response = connection.getresponse()
+                    break
+                except (http.client.BadStatusLine, http.client.CannotSendRequest, ConnectionResetError, BrokenPipeError):
+                    # La conexión keep-alive ya no es válida: abrir una nueva y reintentar
+                    self.close_http_connection()
+                    if attempt:
+                        raise
+                except Exception:
+                    self.close_http_connection()
+                    raise
+
+            try:
+                if on_line is None or response.status != 200:
+                    return response.status, response.read()
+                for line in iter(response.readline, b""):
+                    on_line(line.decode("utf-8"))
+                return response.status, b""
+            except Exception:
+                self.close_http_connection()
+                raise
+
+    def block_delimiters(self, command, language=""):
+        """
+        Construye las marcas de inicio y fin del bloque que envuelve la respuesta de la IA.
+
+        :param command: El comando de IA que se ejecutó.
+        :param language: El idioma de destino con el que se lanzó la traducción (opcional).
+        :return: Una tupla con la marca de inicio y la marca de fin.
+        """
+        label = self._cmd_labels[command]
+        block_start, block_end = self._block_marks
+
+        return (f"\n\n[---{block_start} {label} {language}---]\n",
+                f"\n[/---{block_end} {label} {language}---]\n\n")
+
+    def insert_text(self, target, new_text, command, language=""):
         """
         Inserta el texto generado por la IA en el documento.
 
-        Reemplaza la selección actual con el texto original seguido del resultado de la IA,
-        envuelto en bloques de inicio y fin para mayor claridad.
+        Añade a continuación del texto seleccionado el resultado de la IA, envuelto en
+        bloques de inicio y fin para mayor claridad. El texto original no se reescribe,
+        por lo que no vuelve a enviarse a través del puente UNO.
 
-        :param doc: El documento activo.
+        :param target: El cursor de texto que abarca la selección original.
         :param new_text: El texto generado por la IA para insertar.
-        :param selection: El texto original que fue seleccionado.
         :param command: El comando de IA que se ejecutó.
+        :param language: El idioma de destino con el que se lanzó la traducción (opcional).
         """
-        language = ""
-        if(command == "translate"):
-            language = self.get_config("language", "")
-        
-        command = self.lang['command_' + command]
+        block_start, block_end = self.block_delimiters(command, language)
+        target.collapseToEnd()
+        self.append_text(target, block_start + new_text + block_end)
 
-        cursor = doc.getCurrentController().getViewCursor()
-        cursor.setString(selection + f"\n\n[---{self.lang['block_start']} {command.upper()} {language}---]\n{new_text}\n[/---{self.lang['block_end']} {command.upper()} {language}---]\n\n")
+    def begin_insert(self, target, command, language=""):
+        """
+        Prepara la inserción en streaming de la respuesta de la IA.
+
+        Añade la marca de inicio del bloque a continuación del texto seleccionado y deja
+        el cursor al final, donde se irán añadiendo los fragmentos.
+
+        :param target: El cursor de texto que abarca la selección original.
+        :param command: El comando de IA que se ejecutó.
+        :param language: El idioma de destino con el que se lanzó la traducción (opcional).
+        """
+        block_start, _ = self.block_delimiters(command, language)
+        target.collapseToEnd()
+        self.append_text(target, block_start)
+
+    def append_text(self, target, text):
+        """
+        Añade un fragmento de la respuesta en la posición del cursor y lo avanza.
+
+        :param target: El cursor de texto situado al final de la respuesta insertada.
+        :param text: El fragmento de texto a añadir.
+        """
+        target.getText().insertString(target, text, False)
+
+    def end_insert(self, target, command, language=""):
+        """
+        Cierra el bloque de la respuesta insertada en streaming con la marca de fin.
+
+        :param target: El cursor de texto situado al final de la respuesta insertada.
+        :param command: El comando de IA que se ejecutó.
+        :param language: El idioma de destino con el que se lanzó la traducción (opcional).
+        """
+        _, block_end = self.block_delimiters(command, language)
+        self.append_text(target, block_end)
 
     def show_dialog(self, title, message, type = "ERRORBOX"):
         """
@@ -334,11 +911,7 @@ class AIWriterExtension(unohelper.Base, XJobExecutor):
         :param message: El mensaje a mostrar en el cuadro de diálogo.
         :param type: El tipo de cuadro de diálogo (ej. "ERRORBOX", "INFOBOX").
         """
-        localContext = uno.getComponentContext()
-    
-        # Obtener el servicio de ventanas
-        smgr = localContext.ServiceManager
-        toolkit = smgr.createInstanceWithContext("com.sun.star.awt.Toolkit", localContext)
+        toolkit = self.get_toolkit()
         
         # Crear un cuadro de diálogo de tipo información
         msgbox = toolkit.createMessageBox(
@@ -357,29 +930,45 @@ class AIWriterExtension(unohelper.Base, XJobExecutor):
             print("El usuario hizo clic en OK")
         """
 
-    def settings_box(self,title="", x=None, y=None):
+    def get_toolkit(self):
         """
-        Crea y muestra el cuadro de diálogo de configuración.
+        Obtiene el servicio Toolkit de la AWT de UNO.
 
-        Permite al usuario introducir la clave de la API de OpenAI, el modelo,
-        la temperatura y el máximo de tokens.
+        El servicio se crea una sola vez y se guarda a nivel de clase, ya que
+        show_dialog puede llamarse antes de que la instancia esté inicializada.
+
+        :return: El servicio com.sun.star.awt.Toolkit.
+        """
+        if AIWriterExtension._toolkit is None:
+            ctx = uno.getComponentContext()
+            AIWriterExtension._toolkit = ctx.ServiceManager.createInstanceWithContext("com.sun.star.awt.Toolkit", ctx)
+        return AIWriterExtension._toolkit
+
+    def _build_dialog(self, title, field_specs, width, height, x=None, y=None, focus="btn_ok"):
+        """
+        Crea y muestra un cuadro de diálogo con una lista de campos de texto.
+
+        Cada campo se compone de una etiqueta y un cuadro de edición inicializado
+        con el valor indicado.
 
         :param title: El título para el cuadro de diálogo.
+        :param field_specs: Lista de tuplas (key, label_i18n, value) que describen los campos.
+        :param width: El ancho del cuadro de diálogo.
+        :param height: El alto del cuadro de diálogo.
         :param x: Coordenada X opcional para la posición del diálogo.
         :param y: Coordenada Y opcional para la posición del diálogo.
-        :return: Un diccionario con los valores de configuración guardados.
+        :param focus: El nombre del control que recibe el foco al abrir el diálogo.
+        :return: Un diccionario con el texto de cada campo indexado por su key,
+                 o None si el usuario cierra el diálogo sin aceptar.
         """
-        WIDTH = 600
         HORI_MARGIN = VERT_MARGIN = 8
+        VERT_SEP = 50
         BUTTON_WIDTH = 100
         BUTTON_HEIGHT = 26
         LABEL_HEIGHT = BUTTON_HEIGHT  + 5
         EDIT_HEIGHT = 24
-        HEIGHT = 400
-        import uno
-        from com.sun.star.awt.PosSize import POS, SIZE, POSSIZE # type: ignore
-        from com.sun.star.awt.PushButtonType import OK, CANCEL # type: ignore
-        from com.sun.star.util.MeasureUnit import TWIP # type: ignore
+        LABEL_WIDTH = 120
+        CONTROL_WIDTH = 450
         ctx = uno.getComponentContext()
         def create(name):
             return ctx.getServiceManager().createInstanceWithContext(name, ctx)
@@ -388,7 +977,7 @@ class AIWriterExtension(unohelper.Base, XJobExecutor):
         dialog.setModel(dialog_model)
         dialog.setVisible(False)
         dialog.setTitle(title)
-        dialog.setPosSize(0, 0, WIDTH, HEIGHT, SIZE)
+        dialog.setPosSize(0, 0, width, height, SIZE)
         def add(name, type, x_, y_, width_, height_, props):
             model = dialog_model.createInstance("com.sun.star.awt.UnoControl" + type + "Model")
             dialog_model.insertByName(name, model)
@@ -396,66 +985,82 @@ class AIWriterExtension(unohelper.Base, XJobExecutor):
             control.setPosSize(x_, y_, width_, height_, POSSIZE)
             for key, value in props.items():
                 setattr(model, key, value)
-        label_width = 120
-        control_width = 450
-        add("label_openai_api_key", "FixedText", HORI_MARGIN, VERT_MARGIN+4, label_width, LABEL_HEIGHT, {"Label": f"{self.lang['openai_api_key']}:", "NoLabel": True})
-        add("edit_openai_api_key", "Edit", HORI_MARGIN + label_width, VERT_MARGIN, control_width, EDIT_HEIGHT, {"Text": str(self.get_config("openai_api_key","")), "MultiLine":False})
-        
-        add("label_model", "FixedText", HORI_MARGIN, 62, label_width, LABEL_HEIGHT, {"Label": f"{self.lang['openai_model']}:", "NoLabel": True})
-        add("edit_model", "Edit", HORI_MARGIN + label_width, 58, control_width, EDIT_HEIGHT, {"Text": str(self.get_config("model","gpt-4o-mini"))})
-        
-        add("label_max_tokens", "FixedText", HORI_MARGIN, 112, label_width, LABEL_HEIGHT, {"Label": f"{self.lang['max_tokens']}:", "NoLabel": True})
-        add("edit_max_tokens", "Edit", HORI_MARGIN + label_width, 108, control_width, EDIT_HEIGHT, {"Text": str(self.get_config("max_tokens","1000"))})
 
-        add("label_temperature", "FixedText", HORI_MARGIN, 162, label_width, LABEL_HEIGHT, {"Label": f"{self.lang['temperature']}:", "NoLabel": True})
-        add("edit_temperature", "Edit", HORI_MARGIN+ label_width, 158, control_width, EDIT_HEIGHT, {"Text": str(self.get_config("temperature","0.5"))})
+        values = {}
+        for index, (key, label, value) in enumerate(field_specs):
+            top = VERT_MARGIN + index * VERT_SEP
+            values[key] = value
+            add("label_" + key, "FixedText", HORI_MARGIN, top + 4, LABEL_WIDTH, LABEL_HEIGHT, {"Label": f"{self.lang[label]}:", "NoLabel": True})
+            add("edit_" + key, "Edit", HORI_MARGIN + LABEL_WIDTH, top, CONTROL_WIDTH, EDIT_HEIGHT, {"Text": values[key]})
 
-        add("btn_ok", "Button", WIDTH - 120, HEIGHT - 50, BUTTON_WIDTH, BUTTON_HEIGHT, {"PushButtonType": OK, "DefaultButton": True})
+        add("btn_ok", "Button", width - 120, height - 50, BUTTON_WIDTH, BUTTON_HEIGHT, {"PushButtonType": OK, "DefaultButton": True})
 
-        frame = create("com.sun.star.frame.Desktop").getCurrentFrame()
+        frame = self.desktop.getCurrentFrame()
         window = frame.getContainerWindow() if frame else None
-        dialog.createPeer(create("com.sun.star.awt.Toolkit"), window)
+        dialog.createPeer(self.get_toolkit(), window)
         if not x is None and not y is None:
             ps = dialog.convertSizeToPixel(uno.createUnoStruct("com.sun.star.awt.Size", x, y), TWIP)
             _x, _y = ps.Width, ps.Height
         elif window:
             ps = window.getPosSize()
-            _x = ps.Width / 2 - WIDTH / 2
-            _y = ps.Height / 2 - HEIGHT / 2
+            _x = ps.Width / 2 - width / 2
+            _y = ps.Height / 2 - height / 2
         dialog.setPosSize(_x, _y, 0, 0, POS)
-        
-        edit_openai_api_key = dialog.getControl("edit_openai_api_key")
-        edit_openai_api_key.setSelection(uno.createUnoStruct("com.sun.star.awt.Selection", 0, len(str(self.get_config("openai_api_key","")))))
-        
-        edit_model = dialog.getControl("edit_model")
-        edit_model.setSelection(uno.createUnoStruct("com.sun.star.awt.Selection", 0, len(str(self.get_config("model","gpt-4o-mini")))))
 
-        edit_max_tokens = dialog.getControl("edit_max_tokens")
-        edit_max_tokens.setSelection(uno.createUnoStruct("com.sun.star.awt.Selection", 0, len(str(self.get_config("max_tokens","1000")))))
+        for key, value in values.items():
+            dialog.getControl("edit_" + key).setSelection(uno.createUnoStruct("com.sun.star.awt.Selection", 0, len(value)))
 
-        edit_temperature = dialog.getControl("edit_temperature")
-        edit_temperature.setSelection(uno.createUnoStruct("com.sun.star.awt.Selection", 0, len(str(self.get_config("temperature","0.5")))))
-        
-        btn_ok = dialog.getControl("btn_ok")
-        btn_ok.setFocus()
+        dialog.getControl(focus).setFocus()
 
         if dialog.execute():
+            result = {key: dialog.getControl("edit_" + key).getModel().Text for key in values}
+        else:
+            result = None
+
+        dialog.dispose()
+        return result
+
+    def settings_box(self,title="", x=None, y=None):
+        """
+        Crea y muestra el cuadro de diálogo de configuración.
+
+        Permite al usuario introducir la clave de la API de OpenAI, el modelo,
+        la temperatura y el máximo de tokens.
+
+        :param title: El título para el cuadro de diálogo.
+        :param x: Coordenada X opcional para la posición del diálogo.
+        :param y: Coordenada Y opcional para la posición del diálogo.
+        :return: Un diccionario con los valores de configuración guardados.
+        """
+        openai_api_key = str(self.get_config("openai_api_key", ""))
+        model = str(self.get_config("model", "gpt-4o-mini"))
+        max_tokens = str(self.get_config("max_tokens", "1000"))
+        temperature = str(self.get_config("temperature", "0.5"))
+
+        field_specs = [
+            ("openai_api_key", "openai_api_key", openai_api_key),
+            ("model", "openai_model", model),
+            ("max_tokens", "max_tokens", max_tokens),
+            ("temperature", "temperature", temperature),
+        ]
+        values = self._build_dialog(title, field_specs, 600, 400, x, y)
+
+        if values is not None:
             result = {
-                "openai_api_key":edit_openai_api_key.getModel().Text,
-                "model": edit_model.getModel().Text,
-                "temperature": float(edit_temperature.getModel().Text)
+                "openai_api_key": values["openai_api_key"],
+                "model": values["model"],
+                "temperature": float(values["temperature"])
             }
-            if edit_max_tokens.getModel().Text.isdigit():
-                result["max_tokens"] = int(edit_max_tokens.getModel().Text)
+            if values["max_tokens"].isdigit():
+                result["max_tokens"] = int(values["max_tokens"])
         else:
             result = {
-                "openai_api_key": str(self.get_config("openai_api_key","")),
-                "model": str(self.get_config("model","gpt-4o-mini")),
-                "max_tokens": str(self.get_config("max_tokens","1000")),
-                "temperature": float(self.get_config("temperature", "0.5"))
+                "openai_api_key": openai_api_key,
+                "model": model,
+                "max_tokens": max_tokens,
+                "temperature": float(temperature)
             }
 
-        dialog.dispose()
         return result
     
     def translation_box(self,title="", x=None, y=None):
@@ -470,69 +1075,22 @@ class AIWriterExtension(unohelper.Base, XJobExecutor):
         :param y: Coordenada Y opcional para la posición del diálogo.
         :return: Un diccionario con el idioma de destino.
         """
-        WIDTH = 600
-        HORI_MARGIN = VERT_MARGIN = 8
-        BUTTON_WIDTH = 100
-        BUTTON_HEIGHT = 26
-        HORI_SEP = 8
-        VERT_SEP = 4
-        LABEL_HEIGHT = BUTTON_HEIGHT  + 5
-        EDIT_HEIGHT = 24
-        HEIGHT = 200
-        import uno
-        from com.sun.star.awt.PosSize import POS, SIZE, POSSIZE # type: ignore
-        from com.sun.star.awt.PushButtonType import OK, CANCEL # type: ignore
-        from com.sun.star.util.MeasureUnit import TWIP # type: ignore
-        ctx = uno.getComponentContext()
-        def create(name):
-            return ctx.getServiceManager().createInstanceWithContext(name, ctx)
-        dialog = create("com.sun.star.awt.UnoControlDialog")
-        dialog_model = create("com.sun.star.awt.UnoControlDialogModel")
-        dialog.setModel(dialog_model)
-        dialog.setVisible(False)
-        dialog.setTitle(title)
-        dialog.setPosSize(0, 0, WIDTH, HEIGHT, SIZE)
-        def add(name, type, x_, y_, width_, height_, props):
-            model = dialog_model.createInstance("com.sun.star.awt.UnoControl" + type + "Model")
-            dialog_model.insertByName(name, model)
-            control = dialog.getControl(name)
-            control.setPosSize(x_, y_, width_, height_, POSSIZE)
-            for key, value in props.items():
-                setattr(model, key, value)
-        label_width = 120
-        control_width = 450
-        add("label_language", "FixedText", HORI_MARGIN, VERT_MARGIN+4, label_width, LABEL_HEIGHT, {"Label": f"{self.lang['translate_to']}:", "NoLabel": True})
-        add("edit_language", "Edit", HORI_MARGIN + label_width, VERT_MARGIN, control_width, EDIT_HEIGHT, {"Text": str(self.get_config("language",""))})
-        
-        add("btn_ok", "Button", WIDTH - 120, HEIGHT - 50, BUTTON_WIDTH, BUTTON_HEIGHT, {"PushButtonType": OK, "DefaultButton": True})
+        language = str(self.get_config("language", ""))
 
-        frame = create("com.sun.star.frame.Desktop").getCurrentFrame()
-        window = frame.getContainerWindow() if frame else None
-        dialog.createPeer(create("com.sun.star.awt.Toolkit"), window)
-        if not x is None and not y is None:
-            ps = dialog.convertSizeToPixel(uno.createUnoStruct("com.sun.star.awt.Size", x, y), TWIP)
-            _x, _y = ps.Width, ps.Height
-        elif window:
-            ps = window.getPosSize()
-            _x = ps.Width / 2 - WIDTH / 2
-            _y = ps.Height / 2 - HEIGHT / 2
-        dialog.setPosSize(_x, _y, 0, 0, POS)
-        
-        edit_language = dialog.getControl("edit_language")
-        edit_language.setSelection(uno.createUnoStruct("com.sun.star.awt.Selection", 0, len(str(self.get_config("language","")))))
-        
-        edit_language.setFocus()
+        field_specs = [
+            ("language", "translate_to", language),
+        ]
+        values = self._build_dialog(title, field_specs, 600, 200, x, y, focus="edit_language")
 
-        if dialog.execute():
+        if values is not None:
             result = {
-                "language":edit_language.getModel().Text
+                "language": values["language"]
             }
         else:
             result = {
-                "language": str(self.get_config("language",""))
+                "language": language
             }
 
-        dialog.dispose()
         return result
     
     def find_extension_path(self):
@@ -550,10 +1108,16 @@ class AIWriterExtension(unohelper.Base, XJobExecutor):
         (en versiones más antiguas), recurre a métodos manuales como consultar el
         registro de Windows o construir rutas basadas en el directorio de inicio del usuario.
 
+        La ruta encontrada se guarda a nivel de clase, ya que no cambia durante la sesión.
+
         :return: La ruta completa al archivo de la extensión si se encuentra.
                  Devuelve `None` si no se puede localizar la extensión, tras mostrar
                  un cuadro de diálogo de error.
         """
+        if AIWriterExtension._extension_path is not None:
+            return AIWriterExtension._extension_path
+
+        import platform
         ctx = uno.getComponentContext()
         smgr = ctx.ServiceManager
 
@@ -608,10 +1172,13 @@ class AIWriterExtension(unohelper.Base, XJobExecutor):
                 base_path = potential_path
 
             if os.path.exists(base_path):
-                for folder in os.listdir(base_path):
-                    extension_path = os.path.join(base_path, folder)
-                    if os.path.isdir(extension_path) and EXTENSION_NAME in os.listdir(extension_path):
-                        return os.path.join(extension_path, EXTENSION_NAME)
+                with os.scandir(base_path) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            candidate = os.path.join(entry.path, EXTENSION_NAME)
+                            if os.path.exists(candidate):
+                                AIWriterExtension._extension_path = candidate
+                                return candidate
 
         self.show_dialog(self.lang['error'], f"ERROR: Could not find extension '{EXTENSION_NAME}'. Checked potential paths: {potential_paths}")
         return None
@@ -619,6 +1186,9 @@ class AIWriterExtension(unohelper.Base, XJobExecutor):
 
     def get_ui_language(self):
         """Obtiene el idioma de la interfaz de usuario de LibreOffice."""
+        if AIWriterExtension._ui_language is not None:
+            return AIWriterExtension._ui_language
+
         ctx = uno.getComponentContext()
         smgr = ctx.ServiceManager
         config_provider = smgr.createInstanceWithContext("com.sun.star.configuration.ConfigurationProvider", ctx)
@@ -632,24 +1202,55 @@ class AIWriterExtension(unohelper.Base, XJobExecutor):
         access = config_provider.createInstanceWithArguments("com.sun.star.configuration.ConfigurationAccess", (param,))
         
         # Obtener el idioma de la UI
-        return access.getPropertyValue("ooLocale")
+        AIWriterExtension._ui_language = access.getPropertyValue("ooLocale")
+        return AIWriterExtension._ui_language
+
+    def get_lang_dir(self):
+        """
+        Obtiene el directorio que contiene los archivos de idioma.
+
+        Los archivos de idioma se distribuyen junto a este módulo dentro de la extensión,
+        así que se buscan primero a partir de su propia ubicación. Solo si no se
+        encuentran allí se recurre a la búsqueda de la ruta de instalación.
+
+        :return: La ruta del directorio de idiomas, terminada en el separador de rutas.
+        """
+        if _LANG_DIR is not None:
+            return _LANG_DIR
+        return os.path.join(self.find_extension_path(), "lang") + os.sep
+
+    def get_lang_code(self):
+        """
+        Obtiene el código de idioma (ej. 'es', 'en') de la interfaz de LibreOffice.
+
+        :return: El código de idioma, o el idioma por defecto si no se puede determinar.
+        """
+        return self.get_ui_language().partition('-')[0].lower() or DEFAULT_LANG
 
     def get_language(self):
         """
         Carga el archivo de idioma correcto basado en la configuración de la UI de LibreOffice.
 
-        Busca un archivo .json que coincida con el código de idioma de la UI. Si no lo encuentra,
-        recurre al idioma por defecto (español).
+        Busca un archivo .json que coincida con el código de idioma de la UI. Si no existe,
+        recurre al idioma por defecto (español). Las cadenas ya analizadas se comparten
+        entre todas las instancias a nivel de clase, por lo que la ruta solo se resuelve
+        y el archivo solo se lee una vez por sesión.
+
+        :return: Un diccionario con las cadenas de idioma.
         """
-        base_path = self.find_extension_path()
-        lang = self.get_ui_language()[0:2]
-        filename = os.path.join(base_path, "lang", f"{lang}.json")
+        lang = self.get_lang_code()
+        strings = AIWriterExtension._lang_cache.get(lang)
+        if strings is not None:
+            return strings
 
-        if not os.path.exists(filename):
-            filename = os.path.join(base_path, "lang", f"{DEFAULT_LANG}.json")
+        lang_dir = self.get_lang_dir()
+        try:
+            strings = _load_lang(f"{lang_dir}{lang}.json")
+        except FileNotFoundError:
+            strings = _load_lang(f"{lang_dir}{DEFAULT_LANG}.json")
 
-        with open(filename, "r", encoding="utf-8") as lang_file:
-            return lang_file.read()
+        AIWriterExtension._lang_cache[lang] = strings
+        return strings
 
 # Iniciando desde un IDE de Python
 def main():
@@ -660,19 +1261,20 @@ def main():
     try:
         ctx = XSCRIPTCONTEXT # type: ignore
     except NameError:
+        import officehelper # type: ignore
         ctx = officehelper.bootstrap()
         if ctx is None:
-            print("ERROR: Could not bootstrap default Office.")
-            sys.exit(1)
+            raise SystemExit("ERROR: Could not bootstrap default Office.")
     job = AIWriterExtension(ctx)
     job.trigger("hello")
 # Iniciando desde la línea de comandos
 if __name__ == "__main__":
     main()
-# Registrar la implementación de la extensión en LibreOffice
-g_ImplementationHelper = unohelper.ImplementationHelper()
-g_ImplementationHelper.addImplementation(
-    AIWriterExtension,
-    "com.datosonline.AIWriterExtension.do",
-    ("com.sun.star.task.Job",),
-)
+# Registrar la implementación de la extensión en LibreOffice (no es necesario al ejecutarse como script)
+if __name__ != "__main__":
+    g_ImplementationHelper = unohelper.ImplementationHelper()
+    g_ImplementationHelper.addImplementation(
+        AIWriterExtension,
+        "com.datosonline.AIWriterExtension.do",
+        ("com.sun.star.task.Job",),
+    )